@@ -1,71 +1,282 @@
+import argparse
+import asyncio
+import errno
+import hashlib
 import os
+import re
 import shutil
+import sqlite3
+import threading
 import time
 import logging
+import logging.handlers
+import queue
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from functools import lru_cache
 from watchdog.observers import Observer
-from PIL import Image
-from watchdog.events import FileSystemEventHandler
+from watchdog.events import (PatternMatchingEventHandler, FileCreatedEvent,
+                             FileClosedEvent, FileDeletedEvent)
 from mutagen import File
 from mutagen.mp3 import MP3
-from mutagen.easyid3 import EasyID3
-from mutagen.id3 import APIC
+from mutagen.id3 import APIC, USLT, TPE1, TALB, TIT2, TRCK, TDRC
 import musicbrainzngs
 
-logging.basicConfig(level=logging.INFO,
-                    format='%(asctime)s - %(message)s',
-                    datefmt='%Y-%m-%d %H:%M:%S')
+logger = logging.getLogger("music_sorter")
 
-class MusicFileHandler(FileSystemEventHandler):
+MUSIC_EXTS = frozenset({'.mp3', '.flac', '.ogg', '.m4a'})
+IMAGE_EXTS = frozenset({'.jpg', '.jpeg', '.png'})
+
+# On POSIX an f-string builds the whole destination path in one allocation;
+# os.path.join stays as the portable branch
+_POSIX_PATHS = os.sep == '/'
+
+def _ext_of(path):
+    """Lowercased extension (with dot) via a single C-level rpartition"""
+    head, dot, ext = path.rpartition('.')
+    if not head or os.sep in ext or (os.altsep and os.altsep in ext):
+        return ''
+    return ('.' + ext).lower()
+
+# Anything that isn't a word character (incl. unicode letters/digits), dot or space
+_DISALLOWED_CHARS = re.compile(r'[^\w. ]+')
+
+# First four-digit run in a date tag; TDRC stringifies to e.g. "2023-01-01"
+_YEAR_RE = re.compile(r'(\d{4})')
+
+# Easy tag key -> raw ID3 frame type, for frame-level writes on MP3s
+_ID3_FRAMES = {'artist': TPE1, 'album': TALB, 'title': TIT2,
+               'tracknumber': TRCK, 'date': TDRC}
+
+@lru_cache(maxsize=4096)
+def _read_tags(key):
+    """Parse the file named in key, which carries (ino, mtime_ns, size) so
+    any on-disk change produces a fresh cache entry"""
+    filepath = key[3]
+    if _ext_of(filepath) == '.mp3':
+        audio = MP3(filepath)
+        # Ensure ID3 tags exist
+        if not audio.tags:
+            audio.add_tags()
+        return audio
+    # The easy wrapper gives every other format (incl. m4a) the same
+    # artist/album/title dict interface
+    return File(filepath, easy=True)
+
+def _copy_fd(src_fd, dst_fd, size):
+    """Copy size bytes between open fds without them touching userspace.
+
+    copy_file_range lets the kernel move the data directly (and reflink or
+    offload it where the filesystem can); sendfile covers kernels and
+    filesystem pairs that refuse. Either beats shutil's read/write loop,
+    which drags every byte through Python buffers."""
+    offset = 0
+    use_cfr = hasattr(os, 'copy_file_range')
+    while offset < size:
+        if use_cfr:
+            try:
+                sent = os.copy_file_range(src_fd, dst_fd, size - offset)
+            except OSError as e:
+                if offset or e.errno not in (errno.EXDEV, errno.EINVAL,
+                                             errno.ENOSYS):
+                    raise
+                use_cfr = False
+                continue
+        else:
+            sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+        if sent == 0:
+            break
+        offset += sent
+
+def _kernel_move(src, dst):
+    """Move src to dst across filesystems via an in-kernel copy"""
+    src_fd = os.open(src, os.O_RDONLY | os.O_CLOEXEC)
+    try:
+        size = os.fstat(src_fd).st_size
+        dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC
+                         | os.O_CLOEXEC, 0o666)
+        try:
+            _copy_fd(src_fd, dst_fd, size)
+            # Don't drop the only copy until the new one is on stable storage
+            os.fsync(dst_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    os.unlink(src)
+
+def _drop_page_cache(filepath):
+    """Tell the kernel we won't touch this file again.
+
+    Sorted files are written once and never re-read by this process, so
+    evicting their pages keeps RSS and cache pressure flat on big ingests."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    try:
+        fd = os.open(filepath, os.O_RDONLY | os.O_CLOEXEC)
+    except OSError:
+        return
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+class _TagCache:
+    """Resolved metadata persisted across runs in a small sqlite file.
+
+    In-process parse results already live in the lru_cache; what a restart
+    loses is the MusicBrainz resolution for files whose embedded tags were
+    incomplete, at one rate-limited network call per file. Entries are keyed
+    on (path, mtime_ns, size) so any rewrite of the file invalidates them."""
+
+    _COMMIT_EVERY = 16  # Batch inserts; one fsync per file would defeat the point
+
+    def __init__(self, path='.music_sorter_cache.db'):
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL keeps readers off the writer's back when pool threads overlap
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS tags ('
+            'key TEXT PRIMARY KEY, artist TEXT, album TEXT, title TEXT, '
+            'tracknumber TEXT, date TEXT)')
+        self._conn.commit()
+        self._lock = threading.Lock()  # sqlite3 objects are not thread-safe
+        self._pending = 0
+
+    @staticmethod
+    def _key(filepath):
+        st = os.stat(filepath)
+        return f"{filepath}\x00{st.st_mtime_ns}\x00{st.st_size}"
+
+    def get(self, filepath):
+        """Return a metadata dict for an unchanged file, or None."""
+        try:
+            key = self._key(filepath)
+        except OSError:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT artist, album, title, tracknumber, date '
+                'FROM tags WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        fields = ('artist', 'album', 'title', 'tracknumber', 'date')
+        return {f: v for f, v in zip(fields, row) if v}
+
+    def put(self, filepath, metadata):
+        try:
+            key = self._key(filepath)
+        except OSError:
+            return
+        row = (key, metadata.get('artist'), metadata.get('album'),
+               metadata.get('title'), metadata.get('tracknumber'),
+               metadata.get('date'))
+        with self._lock:
+            self._conn.execute(
+                'INSERT OR REPLACE INTO tags VALUES (?, ?, ?, ?, ?, ?)', row)
+            self._pending += 1
+            if self._pending >= self._COMMIT_EVERY:
+                self._conn.commit()
+                self._pending = 0
+
+    def close(self):
+        with self._lock:
+            self._conn.commit()
+            self._conn.close()
+
+def _load_audio(filepath):
+    """Cached mutagen parse keyed on inode identity, mtime and size.
+
+    Duplicate watchdog events and retries for an unchanged file hit the
+    cache instead of re-walking the tag frames."""
+    st = os.stat(filepath)
+    return _read_tags((st.st_ino, st.st_mtime_ns, st.st_size, filepath))
+
+class MusicFileHandler(PatternMatchingEventHandler):
     def find_cover_art(self, directory):
         """Find and read cover art from jpg/png files in directory"""
-        for file in os.listdir(directory):
-            if file.lower().endswith(('.jpg', '.jpeg', '.png')):
-                image_path = os.path.join(directory, file)
+        with os.scandir(directory) as it:
+            for entry in it:
+                if not entry.is_file():
+                    continue
+                if _ext_of(entry.name) not in IMAGE_EXTS:
+                    continue
                 try:
-                    # Open and verify the image
-                    with Image.open(image_path) as img:
-                        # Convert to bytes
-                        img_format = img.format
-                        if img_format not in ('JPEG', 'PNG'):
-                            continue
-                        
-                        # Convert to bytes
-                        if img_format == 'PNG':
-                            mime_type = 'image/png'
-                        else:
-                            mime_type = 'image/jpeg'
-                            
-                        with open(image_path, 'rb') as f:
-                            return f.read(), mime_type
+                    with open(entry.path, 'rb') as f:
+                        data = f.read()
                 except Exception as e:
-                    print(f"Error reading cover art {image_path}: {e}")
-        
+                    logger.error("Error reading cover art %s: %s", entry.path, e)
+                    continue
+
+                # Sniff the magic bytes instead of paying for a PIL decode
+                if data.startswith(b'\x89PNG\r\n\x1a\n'):
+                    mime_type = 'image/png'
+                elif data[:3] == b'\xff\xd8\xff':
+                    mime_type = 'image/jpeg'
+                else:
+                    continue
+
+                # Multi-disc sets share the same image; keep one copy in memory
+                digest = hashlib.sha1(data).hexdigest()
+                return self._cover_cache.setdefault(digest, (data, mime_type))
+
         return None, None
 
-    def __init__(self):
-        super().__init__()
+    def __init__(self, max_workers=None):
+        # Watchdog does the glob match before dispatching, so callbacks never
+        # fire for temp files, sidecars or directory events
+        super().__init__(patterns=[f"*{ext}" for ext in sorted(MUSIC_EXTS)],
+                         ignore_directories=True, case_sensitive=False)
         self.directory_state = {}  # Track state of each directory
         # Set up MusicBrainz
         musicbrainzngs.set_useragent("MusicSort", "1.0", "https://github.com/tonycollett/musicsort")
         musicbrainzngs.set_rate_limit(True)  # Be nice to the MusicBrainz server
-        self.last_file_time = {}  # Track last file addition time per directory
+        self._timers = {}  # Per-directory debounce handles from loop.call_later
+        self._recent = {}  # path -> monotonic time of last accepted create event
+        self._event_batch = []  # Create events awaiting the next 50 ms drain
+        self._batch_lock = threading.Lock()
+        self._cover_cache = {}  # sha1 digest -> (bytes, mime) shared across directories
+        self._ensured_dirs = set()  # Destination dirs already created this run
+        self._dirs_lock = threading.Lock()  # _ensured_dirs is shared by all workers
+        self.loop = None  # Set once the asyncio event loop is running
+        self._checking = set()  # Directories with a readiness check in flight
+        self._state_lock = threading.Lock()  # Guards directory_state mutations from workers
+        # Blocking tag/file work runs here so the event loop stays responsive
+        if max_workers is None:
+            max_workers = (int(os.environ.get('MUSICSORT_WORKERS', 0))
+                           or min(32, (os.cpu_count() or 1) * 2))
+        self.pool = ThreadPoolExecutor(max_workers=max_workers)
+        self.tag_cache = _TagCache()
 
-    def is_file_locked(self, filepath, timeout=60, check_interval=1):
-        """Check if a file is locked by attempting to open it in write mode"""
+    def _stat_snapshot(self, filepath):
+        """Return (size, mtime_ns) for a file - a cheap probe for write activity"""
+        st = os.stat(filepath)
+        return st.st_size, st.st_mtime_ns
+
+    async def is_file_locked(self, filepath, timeout=60, check_interval=0.25):
+        """Check if a file is still being written by watching for size/mtime changes"""
+        loop = asyncio.get_running_loop()
         start_time = time.time()
         while time.time() - start_time < timeout:
             try:
-                # Try to open the file in write mode (append mode)
-                with open(filepath, 'a+b') as _:
-                    # If we can open it, the file is not locked
+                st = await loop.run_in_executor(None, os.stat, filepath)
+                # File untouched for longer than the stabilization window, safe to process
+                if time.time() - st.st_mtime > 2:
+                    return False
+
+                # Take two snapshots; if nothing changed between them the writer is done
+                before = (st.st_size, st.st_mtime_ns)
+                await asyncio.sleep(check_interval)
+                if before == await loop.run_in_executor(None, self._stat_snapshot, filepath):
                     return False
             except (IOError, PermissionError) as e:
-                logging.debug(f"File {filepath} is currently locked: {e}")
+                logger.debug("File %s is currently locked: %s", filepath, e)
                 # Wait before trying again
-                time.sleep(check_interval)
+                await asyncio.sleep(check_interval)
                 continue
-        
-        logging.warning(f"Timeout waiting for file {filepath} to be unlocked")
+
+        logger.warning("Timeout waiting for file %s to be unlocked", filepath)
         return True
 
     def init_directory_state(self, directory):
@@ -75,100 +286,204 @@ class MusicFileHandler(FileSystemEventHandler):
                 'pending_files': set(),  # Files waiting to be processed
                 'processed_files': set(),  # Successfully processed files
                 'failed_files': set(),  # Failed to process files
-                'stable_since': None  # Timestamp when last file was added
+                'closed_files': set(),  # Files whose writer has closed (inotify only)
+                'stable_since': None,  # Timestamp when last file was added
+                'cover_art': None,  # Memoized (cover_data, mime_type) once probed
+                'cover_frames': None  # Prebuilt APIC/Picture frames shared by all tracks
             }
-            self.last_file_time[directory] = time.time()
 
     def on_created(self, event):
-        if event.is_directory:
+        # Writers that create-then-rename emit several create events for one
+        # final path within milliseconds; drop repeats before paying for the
+        # loop hop. Only the observer thread touches _recent, so no lock
+        path = event.src_path
+        now = time.monotonic()
+        if now - self._recent.get(path, 0) < 2.0:
             return
+        self._recent[path] = now
+        if len(self._recent) > 1024:
+            self._recent = {p: t for p, t in self._recent.items() if now - t < 2.0}
 
-        filepath = event.src_path
-        if filepath.endswith(('.mp3', '.flac', '.ogg', '.m4a')):
-            directory = os.path.dirname(filepath)
-            self.init_directory_state(directory)
-            
-            # Update directory state
-            self.directory_state[directory]['pending_files'].add(filepath)
-            self.last_file_time[directory] = time.time()
-            
-            # Schedule processing check
-            self.check_directory_readiness(directory)
+        # Watchdog callbacks run on the observer thread. Rather than one
+        # loop hop per event, batch paths and drain them in 50 ms windows;
+        # a torrent client dropping an album emits dozens of creates in a
+        # burst and one wakeup covers them all.
+        with self._batch_lock:
+            self._event_batch.append(path)
+            first = len(self._event_batch) == 1
+        if first:
+            self.loop.call_soon_threadsafe(self._arm_drain)
+
+    def _arm_drain(self):
+        self.loop.call_later(
+            0.05, lambda: asyncio.create_task(self._drain_events()))
 
-    def check_directory_readiness(self, directory):
+    async def _drain_events(self):
+        with self._batch_lock:
+            batch, self._event_batch = self._event_batch, []
+        for path in batch:
+            await self._register_file(path)
+
+    def on_deleted(self, event):
+        # A recreated path must be re-read, not served from the parse cache
+        _read_tags.cache_clear()
+
+    def on_closed(self, event):
+        asyncio.run_coroutine_threadsafe(self._register_closed(event.src_path), self.loop)
+
+    async def _register_closed(self, filepath):
+        """Mark a file as done being written.
+
+        On inotify platforms the kernel emits close-write the moment the
+        writer closes the file, so the readiness check can skip the
+        stat-stability probe entirely. Elsewhere on_closed never fires and
+        the probe remains the fallback."""
+        state = self.directory_state.get(os.path.dirname(filepath))
+        if state is not None:
+            state['closed_files'].add(filepath)
+
+    async def _register_file(self, filepath):
+        """Record a newly created music file and re-arm its directory's debounce timer"""
+        directory = os.path.dirname(filepath)
+        self.init_directory_state(directory)
+
+        # Update directory state
+        self.directory_state[directory]['pending_files'].add(filepath)
+        self._schedule_check(directory)
+
+    async def scan_existing(self, root):
+        """Register music files already present under root.
+
+        Files that arrived while the watcher was down never produce events;
+        without this pass they would sit in the watch folder forever. DirEntry
+        objects carry their stat info, so this costs one getdents per
+        directory rather than a stat per file."""
+        stack = [root]
+        found = 0
+        while stack:
+            directory = stack.pop()
+            try:
+                with os.scandir(directory) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            stack.append(entry.path)
+                        elif entry.is_file() and _ext_of(entry.name) in MUSIC_EXTS:
+                            await self._register_file(entry.path)
+                            found += 1
+            except OSError as e:
+                logger.error("Error scanning %s: %s", directory, e)
+        if found:
+            logger.info("Queued %d existing files from %s", found, root)
+
+    def _schedule_check(self, directory, delay=2.0):
+        """(Re)arm the one-shot readiness check for a directory.
+
+        Each new file pushes the check back, so processing starts only once
+        the directory has been quiet for the full delay."""
+        timer = self._timers.get(directory)
+        if timer is not None:
+            timer.cancel()
+        self._timers[directory] = self.loop.call_later(
+            delay, lambda: asyncio.create_task(self.check_directory_readiness(directory)))
+
+    async def check_directory_readiness(self, directory):
         """Check if directory is ready for processing"""
-        state = self.directory_state[directory]
-        current_time = time.time()
-        
-        # Wait for directory to stabilize (no new files for 2 seconds)
-        if current_time - self.last_file_time[directory] < 2:
+        # Skip if a check for this directory is already running
+        if directory in self._checking or directory not in self.directory_state:
             return
-        
-        # Check if all files are unlocked
-        locked_files = []
-        for filepath in state['pending_files']:
-            if os.path.exists(filepath) and self.is_file_locked(filepath):
-                locked_files.append(filepath)
-        
-        if not locked_files:
-            # All files are unlocked, find cover art before processing
-            cover_data = None
-            mime_type = None
-            try:
-                cover_data, mime_type = self.find_cover_art(directory)
-            except Exception as e:
-                logging.error(f"Error finding cover art: {e}")
+        self._checking.add(directory)
+        try:
+            # Check if all files are unlocked
+            state = self.directory_state[directory]
+            locked_files = []
+            for filepath in list(state['pending_files']):
+                # The kernel already told us the writer closed these
+                if filepath in state['closed_files']:
+                    continue
+                if os.path.exists(filepath) and await self.is_file_locked(filepath):
+                    locked_files.append(filepath)
 
-            # Process directory with cover art if found
-            self.process_directory(directory, cover_data, mime_type)
-        else:
-            logging.info(f"Directory {directory} has {len(locked_files)} locked files, waiting...")
+            if not locked_files:
+                loop = asyncio.get_running_loop()
+
+                # All files are unlocked, find cover art before processing.
+                # Probe at most once per directory; retries reuse the memoized bytes
+                if state['cover_art'] is None:
+                    try:
+                        state['cover_art'] = await loop.run_in_executor(
+                            self.pool, self.find_cover_art, directory)
+                    except Exception as e:
+                        logger.error("Error finding cover art: %s", e)
+                        state['cover_art'] = (None, None)
+                cover_data, mime_type = state['cover_art']
+                if cover_data and state['cover_frames'] is None:
+                    state['cover_frames'] = self._build_cover_frames(cover_data, mime_type)
+
+                # Process directory with cover art if found. Run the coordinator
+                # on the default executor: it blocks waiting on per-file futures
+                # and must not occupy a slot in the file worker pool
+                await loop.run_in_executor(
+                    None, self.process_directory, directory, cover_data, mime_type)
+            else:
+                logger.info("Directory %s has %d locked files, waiting...", directory, len(locked_files))
+
+            # Re-arm the timer if the directory still has work outstanding.
+            # Stale timers for completed directories no-op on the guard above
+            if directory in self.directory_state:
+                self._schedule_check(directory)
+        finally:
+            self._checking.discard(directory)
 
     def process_directory(self, directory, cover_data=None, mime_type=None):
-        """Process all files in a directory"""
+        """Process all files in a directory, fanning out across the worker pool"""
         state = self.directory_state[directory]
         pending_files = state['pending_files'].copy()
 
-        for filepath in pending_files:
-            if not os.path.exists(filepath):
-                # File might have been moved by another process
-                state['pending_files'].remove(filepath)
-                continue
+        # Each file is independent; overlap the tag reads and moves
+        futures = [self.pool.submit(self._process_one, filepath, cover_data, mime_type)
+                   for filepath in pending_files]
+        for future in as_completed(futures):
+            try:
+                future.result()
+            except Exception as e:
+                logger.error("Unexpected error processing file: %s", e)
 
-            # Apply cover art before moving the file
-            if cover_data and mime_type:
-                try:
-                    # Handle MP3 files differently for cover art
-                    if filepath.lower().endswith('.mp3'):
-                        audio = MP3(filepath)
-                        # Ensure ID3 tags exist
-                        if not audio.tags:
-                            audio.add_tags()
-                    else:
-                        audio = File(filepath)
-                    
-                    # Process cover art
-                    if audio is not None and (hasattr(audio, 'add_picture') or hasattr(audio, 'tags')):
-                        self.add_cover_art(audio, cover_data, mime_type)
-                        audio.save()
-                        print(f"Successfully applied cover art to {filepath}")
-                except Exception as e:
-                    print(f"Error adding cover art to {filepath}: {e}")
-
-            success = self.process_music_file(filepath)
-            if success:
-                state['pending_files'].remove(filepath)
-                state['processed_files'].add(filepath)
-            else:
-                state['pending_files'].remove(filepath)
-                state['failed_files'].add(filepath)
-                self.move_to_unknown(filepath)
+        logger.info("Processed %s: %d sorted, %d moved to unknown", directory,
+                    len(state['processed_files']), len(state['failed_files']))
 
         # Handle cleanup only after all files are processed and cover art is applied
         if not state['pending_files'] and directory in self.directory_state:
             self.handle_remaining_files(directory)
             del self.directory_state[directory]
-            del self.last_file_time[directory]
+
+    def _process_one(self, filepath, cover_data, mime_type):
+        """Apply cover art to a single pending file, then tag and move it"""
+        state = self.directory_state[os.path.dirname(filepath)]
+
+        if not os.path.exists(filepath):
+            # File might have been moved by another process
+            with self._state_lock:
+                state['pending_files'].discard(filepath)
+            return
+
+        # Parse the file once; the same object serves cover art and metadata
+        audio = None
+        try:
+            audio = _load_audio(filepath)
+        except Exception as e:
+            logger.error("Error reading %s: %s", filepath, e)
+
+        success = self.process_music_file(
+            filepath, audio=audio,
+            cover_frames=state['cover_frames'] if cover_data and mime_type else None)
+        with self._state_lock:
+            state['pending_files'].discard(filepath)
+            if success:
+                state['processed_files'].add(filepath)
+            else:
+                state['failed_files'].add(filepath)
+        if not success:
+            self.move_to_unknown(filepath)
 
     def has_cover_art(self, audio):
         """Check if audio file already has cover art"""
@@ -194,56 +509,74 @@ class MusicFileHandler(FileSystemEventHandler):
             return False
             
         except Exception as e:
-            print(f"Error checking cover art in {audio.filename}: {e}")
+            logger.error("Error checking cover art in %s: %s", audio.filename, e)
             return False
 
-    def add_cover_art(self, audio, image_data, mime_type):
-        """Add cover art to audio file based on format"""
+    def _build_cover_frames(self, image_data, mime_type):
+        """Build the cover art tag frames once; every track shares them"""
+        from mutagen.flac import Picture
+        pic = Picture()
+        pic.data = image_data
+        pic.type = 3  # Cover (front)
+        pic.mime = mime_type
+        apic = APIC(encoding=3, mime=mime_type,
+                    type=3, desc='Cover', data=image_data)
+        return {'flac': pic, 'mp3': apic}
+
+    def add_cover_art(self, audio, frames):
+        """Add cover art to audio file based on format.
+
+        Returns True if the file was modified and needs saving."""
         try:
             # Skip if cover art already exists
             if self.has_cover_art(audio):
-                print(f"Cover art already exists in {audio.filename}")
-                return
+                logger.debug("Cover art already exists in %s", audio.filename)
+                return False
 
             # FLAC files
             if hasattr(audio, 'add_picture'):
-                from mutagen.flac import Picture
-                pic = Picture()
-                pic.data = image_data
-                pic.type = 3  # Cover (front)
-                pic.mime = mime_type
-                audio.add_picture(pic)
-                print(f"Added cover art to FLAC file: {audio.filename}")
+                audio.add_picture(frames['flac'])
+                logger.debug("Added cover art to FLAC file: %s", audio.filename)
+                return True
 
             # MP3 files
             elif hasattr(audio, 'tags') and audio.tags:
                 if hasattr(audio.tags, 'add'):
-                    audio.tags.add(APIC(encoding=3, mime=mime_type,
-                                      type=3, desc='Cover', data=image_data))
-                    print(f"Added cover art to MP3 file: {audio.filename}")
+                    audio.tags.add(frames['mp3'])
+                    logger.debug("Added cover art to MP3 file: %s", audio.filename)
+                    return True
 
         except Exception as e:
-            print(f"Error adding cover art: {e}")
+            logger.error("Error adding cover art: %s", e)
+        return False
 
-    def lookup_musicbrainz_metadata(self, filepath):
+    def lookup_musicbrainz_metadata(self, filepath, audio=None):
         """
         Attempt to find metadata using MusicBrainz acoustic fingerprint.
         Returns a dictionary of tags if successful, None otherwise.
-        """
+
+        Reuses the caller's parsed mutagen object when given one rather
+        than re-parsing the file."""
         try:
             # First try to get any existing metadata that might help with search
-            audio = File(filepath, easy=True)
-            
+            if audio is None:
+                audio = _load_audio(filepath)
+
             # Get audio duration in seconds for better matching
             duration = int(audio.info.length)
-            
+
             search_params = {}
-            
+
             # Try to get any existing metadata that might help
             if audio and hasattr(audio, 'tags'):
-                title = audio.get('title', [''])[0]
-                artist = audio.get('artist', [''])[0]
-                
+                if isinstance(audio, MP3):
+                    tags = audio.tags or {}
+                    title = str(tags['TIT2'][0]) if 'TIT2' in tags else ''
+                    artist = str(tags['TPE1'][0]) if 'TPE1' in tags else ''
+                else:
+                    title = audio.get('title', [''])[0]
+                    artist = audio.get('artist', [''])[0]
+
                 if title:
                     search_params['recording'] = title
                 if artist:
@@ -278,9 +611,40 @@ class MusicFileHandler(FileSystemEventHandler):
                         }
             
         except Exception as e:
-            print(f"Error looking up metadata in MusicBrainz: {e}")
+            logger.error("Error looking up metadata in MusicBrainz: %s", e)
         return None
 
+    def _ensure_dir(self, path):
+        """os.makedirs, skipped when this run has already created the directory"""
+        with self._dirs_lock:
+            if path in self._ensured_dirs:
+                return
+            os.makedirs(path, exist_ok=True)
+            self._ensured_dirs.add(path)
+
+    def _move_file(self, src, dst):
+        """Move a file with a single rename syscall, falling back to an
+        in-kernel copy only when src and dst are on different filesystems"""
+        try:
+            os.replace(src, dst)
+        except FileNotFoundError:
+            if not os.path.exists(src):
+                raise
+            # The memoized destination dir was deleted externally; rebuild it
+            dest_dir = os.path.dirname(dst)
+            with self._dirs_lock:
+                self._ensured_dirs.discard(dest_dir)
+            self._ensure_dir(dest_dir)
+            os.replace(src, dst)
+        except OSError as e:
+            if e.errno != errno.EXDEV:
+                raise
+            try:
+                _kernel_move(src, dst)
+            except OSError:
+                # No kernel-side copy path for this fs pair; userspace loop
+                shutil.move(src, dst)
+
     def move_to_unknown(self, filepath):
         """Move a file to the unknown folder structure"""
         source_dir = os.path.dirname(filepath)
@@ -289,91 +653,130 @@ class MusicFileHandler(FileSystemEventHandler):
         # Create destination path in Unknown folder with same structure
         rel_path = os.path.relpath(source_dir, 'watch')
         dest_dir = os.path.join('unknown', rel_path)
-        os.makedirs(dest_dir, exist_ok=True)
+        self._ensure_dir(dest_dir)
         
         # Move file to Unknown folder structure
         try:
-            shutil.move(filepath, os.path.join(dest_dir, filename))
-            print(f"Moved file to Unknown folder: {filename}")
+            self._move_file(filepath, os.path.join(dest_dir, filename))
+            logger.info("Moved file to Unknown folder: %s", filename)
         except Exception as e:
-            print(f"Error moving file to unknown folder: {e}")
+            logger.error("Error moving file to unknown folder: %s", e)
 
-    def process_music_file(self, filepath):
-        """Process a music file. Returns True if successful, False otherwise."""
-        print(f"Processing file: {filepath}")  # Debugging
-        
-        def get_metadata_field(audio, field, default=None):
-            """Extract metadata field with consistent handling"""
-            if field not in audio:
-                print(f"Missing {field} tag in {filepath}")
+    def process_music_file(self, filepath, audio=None, cover_frames=None):
+        """Process a music file. Returns True if successful, False otherwise.
+
+        Accepts a pre-loaded mutagen object so callers that already parsed
+        the file don't pay for a second parse. All tag mutations - MusicBrainz
+        fixups, cover art and lyrics - are batched onto that one object and
+        committed with a single save() before the move."""
+        logger.debug("Processing file: %s", filepath)
+        base, ext = os.path.splitext(filepath)
+        ext_l = ext.lower()
+
+        def get_metadata_field(tags, field, is_id3=False):
+            """Extract metadata field with consistent handling.
+
+            Accepts easy keys; for raw ID3 containers the key is translated
+            to its frame ID (artist -> TPE1 and so on)."""
+            key = _ID3_FRAMES[field].__name__ if is_id3 else field
+            if key not in tags:
+                logger.debug("Missing %s tag in %s", field, filepath)
                 return None
             try:
-                value = audio[field][0]
-                
+                value = tags[key][0]
+
                 # For track numbers, handle the "5/12" format
                 if field == 'tracknumber':
                     value = str(value).split('/')[0]
                     value = int(value)  # Ensure it's a valid number
                 return value
             except (IndexError, ValueError) as e:
-                print(f"Invalid {field} tag in {filepath}: {e}")
+                logger.debug("Invalid %s tag in %s: %s", field, filepath, e)
                 return None
 
         try:
-            # Use EasyID3 for MP3 files
-            if filepath.lower().endswith('.mp3'):
-                try:
-                    audio = EasyID3(filepath)
-                except:
-                    # If no ID3 tags exist, create them
-                    mp3 = MP3(filepath)
-                    mp3.add_tags()
-                    mp3.save()
-                    audio = EasyID3(filepath)
+            is_mp3 = ext_l == '.mp3'
+            if is_mp3:
+                # Read straight off the raw ID3 frames; no EasyID3 reopen
+                if audio is None:
+                    audio = MP3(filepath)
+                if not audio.tags:
+                    audio.add_tags()
+                tags = audio.tags
             else:
-                # For non-MP3 files, use regular File
-                audio = File(filepath)
                 if audio is None:
-                    print(f"Could not read tags from {filepath}. Skipping.")
-                    return False
+                    # For non-MP3 files, use the easy wrapper for a uniform
+                    # dict interface across formats
+                    audio = File(filepath, easy=True)
+                    if audio is None:
+                        logger.warning("Could not read tags from %s. Skipping.", filepath)
+                        return False
+                tags = audio
+
+            dirty = False  # Whether the audio object has unsaved tag changes
 
             # Extract required metadata
-            artist = get_metadata_field(audio, 'artist')
-            album = get_metadata_field(audio, 'album')
-            title = get_metadata_field(audio, 'title')
-            track_num = get_metadata_field(audio, 'tracknumber')
-            year = get_metadata_field(audio, 'date')
+            artist = get_metadata_field(tags, 'artist', is_mp3)
+            album = get_metadata_field(tags, 'album', is_mp3)
+            title = get_metadata_field(tags, 'title', is_mp3)
+            track_num = get_metadata_field(tags, 'tracknumber', is_mp3)
+            year = get_metadata_field(tags, 'date', is_mp3)
 
             # If missing required fields, try MusicBrainz lookup
             if not all([artist, album, title, track_num, year]):
-                print(f"Missing required tags in {filepath}. Attempting MusicBrainz lookup...")
-                mb_metadata = self.lookup_musicbrainz_metadata(filepath)
-                
+                # A previous run may already have resolved this exact file;
+                # only fall through to the network for genuinely new files
+                mb_metadata = self.tag_cache.get(filepath)
+                if not mb_metadata:
+                    logger.debug("Missing required tags in %s. Attempting MusicBrainz lookup...", filepath)
+                    mb_metadata = self.lookup_musicbrainz_metadata(filepath, audio)
+
                 if mb_metadata:
                     # Update missing fields with MusicBrainz data
+                    updates = {}
                     if not artist and mb_metadata.get('artist'):
-                        audio['artist'] = mb_metadata['artist']
+                        updates['artist'] = mb_metadata['artist']
                         artist = mb_metadata['artist']
                     if not album and mb_metadata.get('album'):
-                        audio['album'] = mb_metadata['album']
+                        updates['album'] = mb_metadata['album']
                         album = mb_metadata['album']
                     if not title and mb_metadata.get('title'):
-                        audio['title'] = mb_metadata['title']
+                        updates['title'] = mb_metadata['title']
                         title = mb_metadata['title']
                     if not track_num and mb_metadata.get('tracknumber'):
-                        audio['tracknumber'] = str(mb_metadata['tracknumber'])
+                        updates['tracknumber'] = str(mb_metadata['tracknumber'])
                         track_num = int(mb_metadata['tracknumber'])
                     if not year and mb_metadata.get('date'):
-                        audio['date'] = mb_metadata['date']
+                        updates['date'] = mb_metadata['date']
                         year = mb_metadata['date']
-                    audio.save()
+
+                    for field, value in updates.items():
+                        if is_mp3:
+                            # Write raw frames so the single MP3 object carries
+                            # everything to the final save
+                            audio.tags.add(_ID3_FRAMES[field](encoding=3, text=[str(value)]))
+                        else:
+                            audio[field] = value
+                    dirty = dirty or bool(updates)
+                    if updates:
+                        # Persist the resolved fields: if this run stops
+                        # before the save below lands, the restart serves
+                        # them from disk instead of repeating the lookup
+                        self.tag_cache.put(filepath, {
+                            'artist': artist and str(artist),
+                            'album': album and str(album),
+                            'title': title and str(title),
+                            'tracknumber': track_num and str(track_num),
+                            'date': year and str(year)})
 
             if not all([artist, album, title, track_num, year]):
-                print(f"Still missing required tags after MusicBrainz lookup. Moving to unknown folder.")
+                logger.info("Still missing required tags in %s after MusicBrainz lookup. Moving to unknown folder.", filepath)
                 return False
 
-            # Extract year from date (e.g. "2023" from "2023-01-01")
-            year = str(year)[:4]
+            # Extract year from date (e.g. "2023" from "2023-01-01"); a blind
+            # [:4] slice would turn a junk date tag into a junk folder name
+            match = _YEAR_RE.search(str(year))
+            year = match.group(1) if match else 'Unknown Year'
 
             # Create destination paths with sanitized names
             artist = self.sanitize_filename(str(artist))
@@ -381,109 +784,161 @@ class MusicFileHandler(FileSystemEventHandler):
             title = self.sanitize_filename(str(title))
 
             # Create destination directory
-            album_folder = f"{album} ({year})"
-            destination_dir = os.path.join('sorted', artist, album_folder)
-            os.makedirs(destination_dir, exist_ok=True)
+            if _POSIX_PATHS:
+                destination_dir = f"sorted/{artist}/{album} ({year})"
+            else:
+                destination_dir = os.path.join('sorted', artist, f"{album} ({year})")
+            self._ensure_dir(destination_dir)
 
             # Rename file, get the extension from original file
-            file_extension = os.path.splitext(filepath)[1][1:] # remove leading dot
+            file_extension = ext[1:] # remove leading dot
             new_filename = f"{track_num:02d} - {title}.{file_extension}"
-            new_filepath = os.path.join(destination_dir, new_filename)
+            if _POSIX_PATHS:
+                new_filepath = f"{destination_dir}/{new_filename}"
+            else:
+                new_filepath = os.path.join(destination_dir, new_filename)
 
             # Add lyrics if available
-            lrc_filepath = os.path.splitext(filepath)[0] + '.lrc'
+            embedded_lyrics = False
+            lrc_filepath = base + '.lrc'
             if os.path.exists(lrc_filepath):
                 try:
                     with open(lrc_filepath, 'r', encoding='utf-8') as lrc_file:
                         lyrics = lrc_file.read()
-                    
-                    if filepath.lower().endswith('.mp3'):
-                        # For MP3 files, need to use regular MP3 object for lyrics
-                        mp3 = MP3(filepath)
-                        from mutagen.id3 import USLT
-                        mp3.tags.add(USLT(encoding=3, lang='eng', desc='', text=lyrics))
-                        mp3.save()
+
+                    if is_mp3:
+                        audio.tags.add(USLT(encoding=3, lang='eng', desc='', text=lyrics))
                     else:
                         audio['lyrics'] = lyrics
-                        audio.save()
-                    print(f"Added lyrics from {lrc_filepath} to {filepath}")
-                    # Delete the source lyrics file after successful embedding
-                    os.remove(lrc_filepath)
-                    print(f"Deleted lyrics file: {lrc_filepath}")
+                    dirty = True
+                    embedded_lyrics = True
+                    logger.debug("Added lyrics from %s to %s", lrc_filepath, filepath)
+                except Exception as e:
+                    logger.error("Error adding lyrics from %s to %s: %s", lrc_filepath, filepath, e)
+
+            # Apply cover art using the frames shared by the whole directory
+            if cover_frames:
+                try:
+                    if self.add_cover_art(audio, cover_frames):
+                        dirty = True
                 except Exception as e:
-                    print(f"Error adding lyrics from {lrc_filepath} to {filepath}: {e}")
+                    logger.error("Error adding cover art to %s: %s", filepath, e)
+
+            # Commit every tag change in one write
+            if dirty:
+                audio.save()
+            if embedded_lyrics:
+                # Delete the source lyrics file now that the embed is on disk
+                os.remove(lrc_filepath)
+                logger.debug("Deleted lyrics file: %s", lrc_filepath)
 
             # Move file
-            shutil.move(filepath, new_filepath)
-            print(f"Moved {filepath} to {new_filepath}")
+            self._move_file(filepath, new_filepath)
+            logger.debug("Moved %s to %s", filepath, new_filepath)
+
+            # The sorted file won't be read again; release its cached pages
+            _drop_page_cache(new_filepath)
 
             return True
 
         except Exception as e:
-            print(f"Error processing {filepath}: {e}")
+            logger.error("Error processing %s: %s", filepath, e)
             return False
 
     def sanitize_filename(self, filename):
         # Remove invalid characters for file names
-        return "".join(c for c in filename if c.isalnum() or c in ['.', '_', ' ']).rstrip()
+        return _DISALLOWED_CHARS.sub('', filename).rstrip()
     
     def remove_empty_dirs(self, path, stop_at=None):
-        """Recursively remove empty directories, return True if directory was removed"""
+        """Remove empty directories bottom-up, return True if the directory was removed"""
         if not os.path.isdir(path):
             return False
-        
-        # Remove empty subdirectories
-        for subdir in os.listdir(path):
-            full_path = os.path.join(path, subdir)
-            if os.path.isdir(full_path) and not os.path.islink(full_path):
-                self.remove_empty_dirs(full_path, stop_at)
-                
-        # Don't remove the stop_at directory
-        if stop_at and os.path.samefile(path, stop_at):
-            return False
-            
-        # Try to remove if empty
-        try:
-            os.rmdir(path)
-            print(f"Removed empty directory: {path}")
-            
-            # Try to remove parent if it's empty (unless it's the stop_at directory)
-            parent = os.path.dirname(path)
-            if parent and (not stop_at or not os.path.samefile(parent, stop_at)):
-                self.remove_empty_dirs(parent, stop_at)
-                
+
+        # Resolve the protected directory to a (dev, inode) pair once instead
+        # of paying two stats per samefile call on every directory
+        stop_key = None
+        if stop_at:
+            try:
+                st = os.stat(stop_at)
+                stop_key = (st.st_dev, st.st_ino)
+            except OSError:
+                pass
+
+        def try_rmdir(d):
+            try:
+                st = os.stat(d)
+                # Don't remove the stop_at directory
+                if stop_key and (st.st_dev, st.st_ino) == stop_key:
+                    return False
+                os.rmdir(d)
+            except OSError:  # Directory not empty (or already gone)
+                return False
+            logger.debug("Removed empty directory: %s", d)
             return True
-        except OSError:  # Directory not empty
-            return False
+
+        # Collect the subtree, parents before children, without recursion
+        dirs = [path]
+        for d in dirs:
+            try:
+                with os.scandir(d) as it:
+                    for entry in it:
+                        if entry.is_dir(follow_symlinks=False):
+                            dirs.append(entry.path)
+            except OSError:
+                continue
+
+        # Remove children before parents
+        removed = False
+        for d in reversed(dirs):
+            if try_rmdir(d) and d == path:
+                removed = True
+
+        # Try to collapse now-empty parents up toward the stop_at directory
+        if removed:
+            parent = os.path.dirname(path)
+            while parent and try_rmdir(parent):
+                parent = os.path.dirname(parent)
+
+        return removed
 
     
     def handle_remaining_files(self, processed_dir):
         """Move non-music/non-cover files to Unknown folder and clean up empty directories"""
-        music_extensions = ('.mp3', '.flac', '.ogg', '.m4a')
-        image_extensions = ('.jpg', '.jpeg', '.png')
         # Handle remaining files: delete cover art, move others to unknown
-        
-        for root, dirs, files in os.walk(processed_dir):
-            if files:  # If there are any files in this directory
-                for file in files:
-                    # Skip music files as they should have been processed already
-                    if file.endswith(music_extensions):
-                        continue
-                    
-                    # Delete cover art files after processing
-                    if file.endswith(image_extensions):
-                        os.remove(os.path.join(root, file))
-                        print(f"Removed cover art file: {file}")
-                        continue
-
-                    source_file = os.path.join(root, file)
-                    rel_path = os.path.relpath(os.path.dirname(source_file), 'watch')
-                    dest_dir = os.path.join('unknown', rel_path)
-                    os.makedirs(dest_dir, exist_ok=True)
-                    
-                    # Move file to Unknown folder structure
-                    shutil.move(source_file, os.path.join(dest_dir, file))
-                    print(f"Moved unprocessed file to Unknown folder: {file}")
+        stack = [processed_dir]
+        while stack:
+            root = stack.pop()
+            try:
+                with os.scandir(root) as it:
+                    entries = list(it)
+            except OSError as e:
+                logger.error("Error scanning %s: %s", root, e)
+                continue
+
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                    continue
+
+                ext = _ext_of(entry.name)
+
+                # Skip music files as they should have been processed already
+                if ext in MUSIC_EXTS:
+                    continue
+
+                # Delete cover art files after processing
+                if ext in IMAGE_EXTS:
+                    os.unlink(entry.path)
+                    logger.debug("Removed cover art file: %s", entry.name)
+                    continue
+
+                rel_path = os.path.relpath(root, 'watch')
+                dest_dir = os.path.join('unknown', rel_path)
+                self._ensure_dir(dest_dir)
+
+                # Move file to Unknown folder structure
+                self._move_file(entry.path, os.path.join(dest_dir, entry.name))
+                logger.info("Moved unprocessed file to Unknown folder: %s", entry.name)
         
         # After moving files, clean up this processed directory if empty
         try:
@@ -491,13 +946,38 @@ class MusicFileHandler(FileSystemEventHandler):
             watch_path = os.path.abspath('watch')
             self.remove_empty_dirs(processed_dir, stop_at=watch_path)
         except Exception as e:
-            print(f"Error removing directory {processed_dir}: {e}")
+            logger.error("Error removing directory %s: %s", processed_dir, e)
 
-if __name__ == "__main__":
+def _setup_logging():
+    """Route log records through a queue.
+
+    Worker threads and the event loop just enqueue records; the listener
+    thread does the formatting and stdout writes."""
+    log_queue = queue.SimpleQueue()
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter('%(asctime)s - %(message)s',
+                                           datefmt='%Y-%m-%d %H:%M:%S'))
+    root = logging.getLogger()
+    root.setLevel(os.environ.get('LOGLEVEL', 'INFO').upper())
+    root.handlers[:] = [logging.handlers.QueueHandler(log_queue)]
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    listener.start()
+    return listener
+
+def _parse_args():
+    parser = argparse.ArgumentParser(
+        description='Watch a folder and sort music files by their tags')
+    parser.add_argument('--max-concurrency', type=int, default=None, metavar='N',
+                        help='worker threads for file processing '
+                             '(default: MUSICSORT_WORKERS env var, or 2x CPU count)')
+    return parser.parse_args()
+
+async def _main(args):
+    listener = _setup_logging()
     watch_folder = 'watch'  # Replace with your watch folder
     if not os.path.exists(watch_folder):
         os.makedirs(watch_folder)
-    
+
     sorted_folder = 'sorted' # The folder where sorted music will go
     if not os.path.exists(sorted_folder):
         os.makedirs(sorted_folder)
@@ -506,17 +986,46 @@ if __name__ == "__main__":
     if not os.path.exists(unknown_folder):
         os.makedirs(unknown_folder)
 
-    event_handler = MusicFileHandler()
+    event_handler = MusicFileHandler(max_workers=args.max_concurrency)
+    event_handler.loop = asyncio.get_running_loop()
+
+    # Watchdog sits on inotify events for 0.5s to pair up moves; our own
+    # per-directory debounce already absorbs bursts, so deliver immediately
+    try:
+        from watchdog.observers.inotify_buffer import InotifyBuffer
+        InotifyBuffer.delay = 0
+    except ImportError:
+        pass
+
     observer = Observer()
-    observer.schedule(event_handler, watch_folder, recursive=True)
+    try:
+        # Only ask the kernel for the events the handler acts on; on inotify
+        # this narrows the watch mask so open/access/modify churn from
+        # unrelated files never even wakes the observer thread
+        observer.schedule(event_handler, watch_folder, recursive=True,
+                          event_filter=[FileCreatedEvent, FileClosedEvent,
+                                        FileDeletedEvent])
+    except TypeError:
+        # Older watchdog without event_filter support; take every event
+        observer.schedule(event_handler, watch_folder, recursive=True)
     observer.start()
 
+    # Pick up anything that was dropped in while we weren't running
+    await event_handler.scan_existing(watch_folder)
+
     try:
-        while True:
-            # Check all directories periodically
-            for directory in list(event_handler.directory_state.keys()):
-                event_handler.check_directory_readiness(directory)
-            time.sleep(1)
-    except KeyboardInterrupt:
+        # Readiness checks are scheduled per directory by the handler's
+        # debounce timers; the main task just parks until shutdown
+        await asyncio.Event().wait()
+    finally:
         observer.stop()
-    observer.join()
+        observer.join()
+        event_handler.pool.shutdown(wait=True)
+        event_handler.tag_cache.close()
+        listener.stop()
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(_main(_parse_args()))
+    except KeyboardInterrupt:
+        pass